@@ -1,20 +1,38 @@
+import functools
 import re
 import os
 import shlex
-from typing import List
+from typing import List, Union
 
-HANDLE_RE = re.compile(r"^[a-zA-z0-9_-]+$")
+_HANDLE_RE = re.compile(r"[A-Za-z0-9_-]+")
 UID = os.getuid()
 
 
-def gen_cmd_for_subprocess(cmd: str) -> List[str]:
+def gen_cmd_for_subprocess(cmd: Union[str, List[str]]) -> List[str]:
+    argv = shlex.split(cmd) if isinstance(cmd, str) else list(cmd)
     if UID != 0:
-        cmd = f"sudo {cmd}"
-    return shlex.split(cmd)
+        argv.insert(0, "sudo")
+    return argv
 
 
+@functools.lru_cache(maxsize=1024)
 def validate_handle(handle: str) -> str:
     handle = str(handle).strip()
-    if not HANDLE_RE.match(handle):
-        raise ValueError("Handle string must match '^[a-zA-z0-9_-]+$' pattern")
+    if not _HANDLE_RE.fullmatch(handle):
+        raise ValueError("Handle string must match '^[A-Za-z0-9_-]+$' pattern")
     return handle
+
+
+def validate_handles(handles: List[str]) -> List[str]:
+    handles = [str(handle).strip() for handle in handles]
+    bad_handles = [
+        handle for handle in handles if not _HANDLE_RE.fullmatch(handle)
+    ]
+    if bad_handles:
+        raise ValueError(
+            "Handle strings must match '^[A-Za-z0-9_-]+$' pattern: "
+            f"{' ,'.join(bad_handles)}"
+        )
+    if len(set(handles)) != len(handles):
+        raise ValueError(f"Handles must be unique: {' ,'.join(handles)}")
+    return handles
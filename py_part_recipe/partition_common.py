@@ -1,9 +1,9 @@
-from collections import defaultdict
 import os
-from dataclasses import dataclass, asdict, field
+import re
+import stat
+from dataclasses import dataclass, field
 import json
-from string import digits
-from typing import Dict, List, Union
+from typing import Dict, List, Tuple, Union
 import parted
 from parted import Disk, DiskException
 import yaml
@@ -12,6 +12,8 @@ from logging import getLogger
 from parted import __exponents
 
 LOGGER = getLogger()
+# libyaml's dumper is 5-10x faster than the pure Python one when present
+_SAFE_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
 PARTITION_NAME_TO_P = {value: key for key, value in parted.partitions.items()}
 if "esp" not in PARTITION_NAME_TO_P:
     PARTITION_NAME_TO_P.update(
@@ -25,17 +27,30 @@ if "esp" not in PARTITION_NAME_TO_P:
         }
     )
 PARTITION_P_TO_NAME = {value: key for key, value in PARTITION_NAME_TO_P.items()}
+_SIZE_RE = re.compile(r"^\s*(\d+)\s*([A-Za-z]*)\s*$")
+_EXPONENTS = dict(__exponents)
+_VALID_TYPES = frozenset(
+    [
+        parted.PARTITION_NORMAL,
+        parted.PARTITION_LOGICAL,
+        parted.PARTITION_EXTENDED,
+        parted.PARTITION_FREESPACE,
+        parted.PARTITION_METADATA,
+        parted.PARTITION_PROTECTED,
+    ]
+)
 
 
 def partition_to_dict(part: parted.Partition):
+    geometry = part.geometry
     return {
         "active": part.active,
         "path": part.path,
         "number": part.number,
         "geometry": {
-            "start": part.geometry.start,
-            "end": part.geometry.end,
-            "length": part.geometry.length,
+            "start": geometry.start,
+            "end": geometry.end,
+            "length": geometry.length,
         },
         "flags": part.getFlagsAsString(),
     }
@@ -91,29 +106,28 @@ def convert_size_to_bytes(size: str):
         "EiB":  1024**6, # exbibyte
         "ZiB":  1024**7, # zebibyte
         "YiB":  1024**8  # yobibyte
-    """
-
-    def index_first_char_not_in(string: str, excluded_chars: str):
-        for index, char in enumerate(string):
-            if char not in excluded_chars:
-                return index
 
-    size = str(size)
-    if size.isnumeric():
+    Sizes already expressed as a number of bytes (int or float) are
+    returned as ints without any parsing.
+    """
+    if isinstance(size, int):
+        return size
+    if isinstance(size, float):
         return int(size)
-    size = size.strip()
-    size = size.replace(" ", "")
-    unit_position = index_first_char_not_in(size, digits)
-    unit = size[unit_position:]
-    if unit not in __exponents:
+    match = _SIZE_RE.match(str(size))
+    if not match:
+        raise ValueError(
+            f"Size ({size}) does not seem to be a quantity followed by a unit"
+        )
+    quantity = int(match.group(1))
+    unit = match.group(2)
+    if not unit:
+        return quantity
+    if unit not in _EXPONENTS:
         raise ValueError(
-            f"unknown Unit {unit} unit must be in {' ,'.join(__exponents.keys())}"
+            f"unknown Unit {unit} unit must be in {' ,'.join(_EXPONENTS.keys())}"
         )
-    quantity_str = size[:unit_position]
-    if not quantity_str.isnumeric():
-        raise (f"Size ({size}) quantity of Unit {unit} does not seem to be a number")
-    quantity = int(quantity_str)
-    return quantity * __exponents[unit]
+    return quantity * _EXPONENTS[unit]
 
 
 @dataclass
@@ -121,6 +135,8 @@ class BlockDevice:
     path: str
     dev_name: str = field(init=False)
     dev_sys_path: str = field(init=False)
+    device: parted.Device = field(init=False)
+    parted_disk: Union[Disk, None] = field(init=False, default=None)
     addressable_space: ChunkableSpace = field(init=False)
     keep_partitions: bool = False
     # base offset is in blocks general agreement
@@ -130,7 +146,18 @@ class BlockDevice:
     footer: int = 33
 
     def to_dict(self):
-        return asdict(self)
+        return {
+            "path": self.path,
+            "dev_name": self.dev_name,
+            "dev_sys_path": self.dev_sys_path,
+            "addressable_space": {
+                "nb_block": self.addressable_space.nb_block,
+                "block_size": self.addressable_space.block_size,
+            },
+            "keep_partitions": self.keep_partitions,
+            "base_offset": self.base_offset,
+            "footer": self.footer,
+        }
 
     def to_json(self, pretty=False):
         if pretty:
@@ -139,23 +166,29 @@ class BlockDevice:
 
     def __post_init__(self):
         self._set_device_info()
+        self.device = parted.Device(self.path)
         self._set_adressable_space()
 
     def _set_device_info(self):
         device = self.path
         if not device.startswith("/dev/"):
             raise ValueError("device path must start with /dev/")
-        if not os.path.exists(device):
+        try:
+            device_stat = os.stat(device)
+        except FileNotFoundError:
             raise LookupError(f"Device {device} not found")
+        if not stat.S_ISBLK(device_stat.st_mode):
+            raise ValueError(f"Device {device} is not a block device")
         if os.path.islink(device):
             device = os.readlink(device)
-        device_name = device.strip("/").split("/")[-1]
-        if device_name not in os.listdir("/sys/class/block"):
+        device_name = os.path.basename(device.rstrip("/"))
+        if not os.path.isdir(f"/sys/class/block/{device_name}"):
             raise ValueError(f"Device {device} is not a block device")
         self.dev_name = device_name
         self.dev_sys_path = os.readlink(f"/sys/class/block/{device_name}")
-        phy_dev_position = self.dev_sys_path.split("/").index("block") + 1
-        partitionable_dev_name = self.dev_sys_path.split("/")[phy_dev_position]
+        sys_path_parts = self.dev_sys_path.split("/")
+        phy_dev_position = sys_path_parts.index("block") + 1
+        partitionable_dev_name = sys_path_parts[phy_dev_position]
         physical_device = f"/dev/{partitionable_dev_name}"
         if physical_device != self.path:
             raise ValueError(
@@ -163,16 +196,15 @@ class BlockDevice:
             )
 
     def _set_adressable_space(self):
-        disk = parted.Device(self.path)
+        disk = self.device
         try:
-            parted_disk = parted.newDisk(disk)
+            self.parted_disk = parted.newDisk(disk)
         except DiskException:
-            parted_disk = None
+            self.parted_disk = None
 
-        if self.keep_partitions and parted_disk:
-            geometries = parted_disk.getFreeSpaceRegions()
-            geometries.sort(key=lambda g: g.end - g.start + 1)
-            largest_free = geometries[-1]
+        if self.keep_partitions and self.parted_disk:
+            geometries = self.parted_disk.getFreeSpaceRegions()
+            largest_free = max(geometries, key=lambda g: g.end - g.start)
             nb_block = largest_free.end - largest_free.start + 1
             # set the offset where the larget free block starts
             self.base_offset = largest_free.start
@@ -201,20 +233,13 @@ class PartitionRequest:
         self.max_size_bytes = convert_size_to_bytes(self.max_size)
         if isinstance(self.p_type, str):
             self.p_type = PARTITION_NAME_TO_P[self.p_type]
-        VALID_TYPES = [
-            parted.PARTITION_NORMAL,
-            parted.PARTITION_LOGICAL,
-            parted.PARTITION_EXTENDED,
-            parted.PARTITION_FREESPACE,
-            parted.PARTITION_METADATA,
-            parted.PARTITION_PROTECTED,
-        ]
-        if self.p_type not in VALID_TYPES:
+        if self.p_type not in _VALID_TYPES:
             raise ValueError(f"Invalid Partition Type {self.p_type}")
-        for index, flag in enumerate(self.flags):
-            if isinstance(flag, str):
-                flag = PARTITION_NAME_TO_P[flag]
-                self.flags[index] = flag
+        self.flags = [
+            PARTITION_NAME_TO_P[flag] if isinstance(flag, str) else flag
+            for flag in self.flags
+        ]
+        for flag in self.flags:
             if flag not in PARTITION_P_TO_NAME:
                 raise ValueError(f"Invqlid Pqrtition Flag {flag}")
 
@@ -244,25 +269,27 @@ class Recipe:
             - partition table type
         """
         self.common_space = min(
-            [
-                dev.addressable_space.nb_block * dev.addressable_space.block_size
-                for dev in self.devices
-            ]
+            dev.addressable_space.nb_block * dev.addressable_space.block_size
+            for dev in self.devices
         )
         self.common_block_size = max(
-            [dev.addressable_space.block_size for dev in self.devices]
+            dev.addressable_space.block_size for dev in self.devices
         )
         self.common_space = (
             self.common_space // self.common_block_size * self.common_block_size
         )
-        disks_table_types = [parted.Device(device.path).type for device in self.devices]
-        error = ", ".join(
-            [
-                f"{disk.path}: {ttype}"
-                for ttype, disk in zip(disks_table_types, self.devices)
-            ]
+        self.common_chunkable_space = ChunkableSpace(
+            self.common_space // self.common_block_size, self.common_block_size
         )
+        disks_table_types = [
+            device.parted_disk.type if device.parted_disk else None
+            for device in self.devices
+        ]
         if self.keep_partitions and len(set(disks_table_types)) > 1:
+            error = ", ".join(
+                f"{disk.path}: {ttype}"
+                for ttype, disk in zip(disks_table_types, self.devices)
+            )
             raise ValueError(
                 f"All disks do not share the same partitionning tabe type {error}"
             )
@@ -274,12 +301,8 @@ class Partitionner:
     def __init__(self, recipe: Recipe, table_type: str = "gpt"):
         self.recipe = recipe
         self.disks: List[parted.Disk] = []
-        self.created_partitions_per_dev: Dict[
-            str, List[parted.Partition]
-        ] = defaultdict(list)
-        self.created_parttions_by_handle: Dict[
-            str, List[parted.Partition]
-        ] = defaultdict(list)
+        self.created_partitions_per_dev: Dict[str, List[parted.Partition]] = {}
+        self.created_parttions_by_handle: Dict[str, List[parted.Partition]] = {}
 
         if table_type in self.valid_ptable_type:
             self.ptable_type = table_type
@@ -296,43 +319,53 @@ class Partitionner:
             )
             for part_req in self.recipe.part_requests
         ]
-        space = ChunkableSpace(
-            self.recipe.common_space // self.recipe.common_block_size,
-            self.recipe.common_block_size,
+        self.block_chunks = qualify_chunks(
+            self.recipe.common_chunkable_space, block_chunks
         )
-        self.block_chunks = qualify_chunks(space, block_chunks)
 
     def create_partitions_mapping(self):
         if self.recipe.keep_partitions:
-            disks = [
-                parted.newDisk(parted.Device(disk.path)) for disk in self.recipe.devices
-            ]
+            disks = [parted.newDisk(disk.device) for disk in self.recipe.devices]
         else:
             disks = [
-                parted.freshDisk(parted.Device(disk.path), self.ptable_type)
+                parted.freshDisk(disk.device, self.ptable_type)
                 for disk in self.recipe.devices
             ]
         self.disks = disks
         self._figure_out_partitions()
+        self.created_partitions_per_dev = {
+            device.path: [] for device in self.recipe.devices
+        }
+        self.created_parttions_by_handle = {
+            part_req.handle: [] for part_req in self.recipe.part_requests
+        }
+        common_block_size = self.recipe.common_block_size
+        part_reqs = self.recipe.part_requests
+        chunks_sectors = [
+            chunk.optimal_final_size // common_block_size
+            for chunk in self.block_chunks
+        ]
+        geometry_cls = parted.Geometry
+        partition_cls = parted.Partition
+        constraint_cls = parted.Constraint
         for disk_index, device in enumerate(self.recipe.devices):
             disk = self.disks[disk_index]
             offset = device.base_offset
-            for part_index, chunk in enumerate(self.block_chunks):
-                part_req = self.recipe.part_requests[part_index]
-                partition_type = part_req.p_type
-                qty_sectors = chunk.optimal_final_size // self.recipe.common_block_size
-                geom = parted.Geometry(
+            dev_partitions = self.created_partitions_per_dev[device.path]
+            for part_index, qty_sectors in enumerate(chunks_sectors):
+                part_req = part_reqs[part_index]
+                geom = geometry_cls(
                     device=disk.device, start=offset, length=qty_sectors
                 )
                 offset += qty_sectors
-                partition = parted.Partition(
-                    disk=disk, type=partition_type, geometry=geom
+                partition = partition_cls(
+                    disk=disk, type=part_req.p_type, geometry=geom
                 )
-                self.created_partitions_per_dev[device.path].append(partition)
+                dev_partitions.append(partition)
                 self.created_parttions_by_handle[part_req.handle].append(partition)
                 disk.addPartition(
                     partition=partition,
-                    constraint=parted.Constraint(exactGeom=geom),
+                    constraint=constraint_cls(exactGeom=geom),
                 )
                 for flag in part_req.flags:
                     partition.setFlag(flag)
@@ -352,7 +385,7 @@ class Partitionner:
     def _serializable_mapping(self, by_handle=False):
         if by_handle:
             data = {
-                handle: [partition_to_dict(part for part in parts)]
+                handle: [partition_to_dict(part) for part in parts]
                 for handle, parts in self.created_parttions_by_handle.items()
             }
             return data
@@ -360,8 +393,11 @@ class Partitionner:
         return data
 
     def __repr__(self):
-        return yaml.safe_dump(
-            self._serializable_mapping(), default_flow_style=False, sort_keys=False
+        return yaml.dump(
+            self._serializable_mapping(),
+            Dumper=_SAFE_DUMPER,
+            default_flow_style=False,
+            sort_keys=False,
         )
 
     def __str__(self):
@@ -374,10 +410,12 @@ class HandledPartitions:
         self.created = False
         self.saved = False
         self.committed_to_os = False
+        self._handle_index: Union[None, Dict[str, Tuple[parted.Partition, ...]]] = None
 
     def create_partitions_mapping(self):
         for part in self.partitionners:
             part.create_partitions_mapping()
+        self._handle_index = None
         self.created = True
 
     def commit_to_devices(self):
@@ -396,20 +434,31 @@ class HandledPartitions:
         self.saved = True
         self.committed_to_os = True
 
-    def get_partitions_by_handle(self, handle: str) -> List[parted.Partition]:
-        partitions: List[parted.partitions] = []
+    def _build_handle_index(self):
+        index: Dict[str, List[parted.Partition]] = {}
         for partitionner in self.partitionners:
-            if handle in partitionner.created_parttions_by_handle:
-                partitions.extend(partitionner.created_parttions_by_handle[handle])
+            for handle, parts in partitionner.created_parttions_by_handle.items():
+                index.setdefault(handle, []).extend(parts)
+        self._handle_index = {
+            handle: tuple(parts) for handle, parts in index.items()
+        }
+
+    def get_partitions_by_handle(self, handle: str) -> Tuple[parted.Partition, ...]:
+        if self._handle_index is None:
+            self._build_handle_index()
+        return self._handle_index.get(handle, ())
+
+    def get_partitions_by_handles(self, handles: List[str]) -> List[parted.Partition]:
+        partitions: List[parted.partitions] = []
+        for handle in handles:
+            partitions.extend(self.get_partitions_by_handle(handle))
         return partitions
 
     def __repr__(self):
         data = {}
-        [
+        for partitionner in self.partitionners:
             data.update(partitionner._serializable_mapping(by_handle=True))
-            for partitionner in self.partitionners
-        ]
-        return yaml.safe_dump(data)
+        return yaml.dump(data, Dumper=_SAFE_DUMPER)
 
     def __str__(self):
         return self.__repr__()
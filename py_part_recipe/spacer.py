@@ -1,8 +1,9 @@
 from dataclasses import dataclass, field
-from typing import List
+from functools import cached_property
+from typing import List, Tuple
 
 
-@dataclass
+@dataclass(slots=True)
 class BlockChunk:
     min_size: int
     max_size: int
@@ -19,12 +20,12 @@ class BlockChunk:
         return self.optimal_max_size - self.optimal_min_size
 
 
-@dataclass
+@dataclass(frozen=True)
 class ChunkableSpace:
     nb_block: int
     block_size: int
 
-    @property
+    @cached_property
     def size_in_octets(self):
         return self.nb_block * self.block_size
 
@@ -51,12 +52,9 @@ def optimal_size(size: int, block_size: int, upward: bool = True) -> int:
         raise ValueError(
             "To determine the optimal size all parameters in size, block_size must be > 0"
         )
-    if size % block_size == 0:
-        return size // block_size * block_size
-    else:
-        nb_blocks = size // block_size + 1 if upward else size // block_size
-        final_size = nb_blocks * block_size
-        return final_size
+    if upward:
+        return (size + block_size - 1) // block_size * block_size
+    return size // block_size * block_size
 
 
 def has_minmun_space(block_space: ChunkableSpace, chunks: List[BlockChunk]) -> bool:
@@ -79,6 +77,73 @@ def has_minmun_space(block_space: ChunkableSpace, chunks: List[BlockChunk]) -> b
     return block_space.block_size * block_space.nb_block >= minimal_space
 
 
+def _qualify_sizes(
+    min_sizes: List[int],
+    max_sizes: List[int],
+    weights: List[int],
+    total_octets: int,
+    block_size: int,
+) -> Tuple[List[int], List[int], List[int], List[int]]:
+    """Numeric allocation kernel behind qualify_chunks
+
+    Works on flat lists of ints so the sizing arithmetic stays separate
+    from the BlockChunk objects.
+
+    Args:
+        min_sizes (List[int]): minimum size per chunk
+        max_sizes (List[int]): maximum size per chunk
+        weights (List[int]): weight per chunk
+        total_octets (int): total space to share
+        block_size (int): block size every size must align to
+
+    Returns:
+        Tuple[List[int], List[int], List[int], List[int]]:
+            optimal min sizes, optimal max sizes, adjusted deltas
+            (-1 when there is no competition for space), final sizes
+    """
+    nb_chunks = len(min_sizes)
+    optimal_mins = [0] * nb_chunks
+    optimal_maxs = [0] * nb_chunks
+    deltas = [-1] * nb_chunks
+    finals = [0] * nb_chunks
+    sum_max_chunks = 0
+    sum_min_chunks = 0
+    sum_weight = 0
+    for index in range(nb_chunks):
+        optimal_min = (min_sizes[index] + block_size - 1) // block_size * block_size
+        optimal_max = max_sizes[index] // block_size * block_size
+        optimal_mins[index] = optimal_min
+        optimal_maxs[index] = optimal_max
+        sum_max_chunks += optimal_max
+        sum_min_chunks += optimal_min
+        sum_weight += weights[index]
+    if total_octets - sum_max_chunks >= 0:
+        return optimal_mins, optimal_maxs, deltas, list(optimal_maxs)
+
+    sum_deltas = 0
+    for index in range(nb_chunks):
+        delta = round(
+            (optimal_maxs[index] - optimal_mins[index]) * weights[index] / sum_weight
+        )
+        deltas[index] = delta
+        sum_deltas += delta
+
+    remaiming_space = total_octets - sum_min_chunks
+    used_space = 0
+    for index in range(nb_chunks):
+        if index == nb_chunks - 1:
+            finals[index] = total_octets - used_space
+            break
+        factor = deltas[index] / sum_deltas
+        finals[index] = (
+            int(optimal_mins[index] + remaiming_space * factor)
+            // block_size
+            * block_size
+        )
+        used_space += finals[index]
+    return optimal_mins, optimal_maxs, deltas, finals
+
+
 def qualify_chunks(
     block_space: ChunkableSpace, chunks: List[BlockChunk]
 ) -> List[BlockChunk]:
@@ -96,41 +161,16 @@ def qualify_chunks(
     """
     if not has_minmun_space(block_space, chunks):
         raise ValueError("not enough space in block_space")
-    for chunk in chunks:
-        chunk.optimal_min_size = optimal_size(chunk.min_size, block_space.block_size)
-        chunk.optimal_max_size = optimal_size(
-            chunk.max_size, block_space.block_size, upward=False
-        )
-    sum_max_chunks = sum([chunk.optimal_max_size for chunk in chunks])
-    minimum_free_space = block_space.size_in_octets - sum_max_chunks
-    if minimum_free_space < 0:
-        competition_for_space = True
-        minimum_free_space = 0
-    else:
-        competition_for_space = False
-    if not competition_for_space:
-        for chunk in chunks:
-            chunk.optimal_final_size = chunk.optimal_max_size
-        return chunks
-
-    sum_weight = sum([chunk.weight for chunk in chunks])
-    for chunk in chunks:
-        chunk.adjusted_delta = round(chunk.delta_max_min * chunk.weight / sum_weight)
-
-    sum_deltas = sum([chunk.adjusted_delta for chunk in chunks])
-    sum_min_chunks = sum([chunk.optimal_min_size for chunk in chunks])
-    remaiming_space = block_space.size_in_octets - sum_min_chunks
+    optimal_mins, optimal_maxs, deltas, finals = _qualify_sizes(
+        [chunk.min_size for chunk in chunks],
+        [chunk.max_size for chunk in chunks],
+        [chunk.weight for chunk in chunks],
+        block_space.size_in_octets,
+        block_space.block_size,
+    )
     for index, chunk in enumerate(chunks):
-        factor = chunk.adjusted_delta / sum_deltas
-        if index == len(chunks) - 1:
-            used_space = sum(
-                [ch.optimal_final_size for ch in chunks if ch.optimal_final_size != -1]
-            )
-            chunk.optimal_final_size = block_space.size_in_octets - used_space
-            return chunks
-        chunk.optimal_final_size = optimal_size(
-            (chunk.optimal_min_size + remaiming_space * factor),
-            block_space.block_size,
-            upward=False,
-        )
+        chunk.optimal_min_size = optimal_mins[index]
+        chunk.optimal_max_size = optimal_maxs[index]
+        chunk.adjusted_delta = deltas[index]
+        chunk.optimal_final_size = finals[index]
     return chunks
@@ -1,13 +1,28 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import os
 import subprocess
+import threading
 from typing import Dict, List, Tuple, Union
 import parted
 from py_part_recipe.partition_common import HandledPartitions
-from py_part_recipe.common import gen_cmd_for_subprocess, validate_handle
+from py_part_recipe.common import (
+    gen_cmd_for_subprocess,
+    validate_handle,
+    validate_handles,
+)
+
+
+_META_DATA_VERSIONS = frozenset(("0", "0.90", "1.0", "1", "1.2"))
+_RAID_EXACT_DEVS = {1: 2, 10: 4}
+_RAID_MIN_DEVS = {4: 3, 5: 3, 6: 3}
 
 
 class Volume(ABC):
+    # concrete classes declare __slots__ and expose built / sys_device as
+    # plain slot attributes, which override these abstract declarations
+    __slots__ = ()
+
     @abstractmethod
     def build(self):
         ...
@@ -32,27 +47,69 @@ class HandledVolumes:
     def __init__(self, volumes: Union[Dict[str, Volume], None] = None):
         self.volumes = volumes if volumes else {}
         self.created = False
+        self._volumes_lock = threading.Lock()
+        # (free extents, total extents) per vg device, maintained by LvmLvVolume
+        self._vg_space_cache: Dict[str, Tuple[int, int]] = {}
+        self._all_built = False
+        self._handle_to_dev_cache: Union[None, Dict[str, str]] = None
 
     def _add_volume(self, volume: Volume):
-        if volume.handle in self.volumes:
-            raise KeyError(
-                f" Volume handle must be unique but {volume.handle}"
-                " is already in use"
-            )
-        self.volumes[volume.handle] = volume
+        with self._volumes_lock:
+            if volume.handle in self.volumes:
+                raise KeyError(
+                    f" Volume handle must be unique but {volume.handle}"
+                    " is already in use"
+                )
+            self.volumes[volume.handle] = volume
+            self._all_built = False
+            self._handle_to_dev_cache = None
 
     @property
     def handle_to_dev(self) -> Dict[str, str]:
-        return {handle: vol.sys_device for handle, vol in self.volumes.items()}
+        if self._handle_to_dev_cache is None:
+            self._handle_to_dev_cache = {
+                handle: vol.sys_device for handle, vol in self.volumes.items()
+            }
+        return self._handle_to_dev_cache
+
+    def _dependencies_built(self, volume: Volume) -> bool:
+        handles: List[str] = []
+        volume_handle = getattr(volume, "volume_handle", None)
+        if volume_handle:
+            handles.append(volume_handle)
+        handles.extend(getattr(volume, "volumes_handles", []))
+        return all(
+            handle in self.volumes and self.volumes[handle].built
+            for handle in handles
+        )
 
     def build(self):
-        for volume in self.volumes.values():
-            volume.build()
+        pending = dict(self.volumes)
+        while pending:
+            buildable = [
+                volume
+                for volume in pending.values()
+                if self._dependencies_built(volume)
+            ]
+            if not buildable:
+                raise ValueError(
+                    "Volumes depend on handles that are not built and not "
+                    f"buildable: {' ,'.join(pending)}"
+                )
+            with ThreadPoolExecutor(max_workers=len(buildable)) as executor:
+                list(executor.map(lambda volume: volume.build(), buildable))
+            for volume in buildable:
+                pending.pop(volume.handle, None)
         self.created = True
 
     @property
     def built(self):
-        return all([volume.built for volume in self.volumes.values()])
+        if not self._all_built:
+            # volumes only ever transition to built, so True can be kept
+            self._all_built = all(
+                volume.built for volume in self.volumes.values()
+            )
+        return self._all_built
 
     def get_by_handle(self, handle: str) -> Volume:
         return self.volumes[handle]
@@ -62,6 +119,8 @@ class HandledVolumes:
 
 
 class PartitionBasedVolume(Volume, ABC):
+    __slots__ = ("partitionners", "partitions_handle", "_handle")
+
     def __init__(
         self,
         *args,
@@ -79,6 +138,8 @@ class PartitionBasedVolume(Volume, ABC):
 
 
 class VolumeBasedVolume(Volume, ABC):
+    __slots__ = ("_handle", "handled_vols", "volume_handle")
+
     def __init__(
         self,
         *args,
@@ -99,6 +160,14 @@ class VolumeBasedVolume(Volume, ABC):
 
 
 class MulitMixedVolume(Volume, ABC):
+    __slots__ = (
+        "_handle",
+        "handled_vols",
+        "handled_parts",
+        "volumes_handles",
+        "partitions_handles",
+    )
+
     def __init__(
         self,
         *args,
@@ -111,10 +180,8 @@ class MulitMixedVolume(Volume, ABC):
         self._handle = validate_handle(handle)
         self.handled_vols = handled_vols
         self.handled_parts = handled_parts
-        self.volumes_handles = [validate_handle(handle) for handle in volumes_handles]
-        self.partitions_handles = [
-            validate_handle(handle) for handle in partitions_handles
-        ]
+        self.volumes_handles = validate_handles(volumes_handles)
+        self.partitions_handles = validate_handles(partitions_handles)
 
     @property
     def handle(self) -> str:
@@ -122,13 +189,19 @@ class MulitMixedVolume(Volume, ABC):
 
 
 class RawVolume(PartitionBasedVolume):
+    __slots__ = ("partition_handle", "partition", "built", "sys_device")
+
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         partitionners = self.partitionners
         if not partitionners.saved or not partitionners.committed_to_os:
             raise ValueError("Given partitioners have not yet set partitions up")
 
-        self.partition_handle = self.partition_handle
+        self.partition_handle = (
+            self.partitions_handle
+            if isinstance(self.partitions_handle, str)
+            else self.partitions_handle[0]
+        )
         _partitions = partitionners.get_partitions_by_handle(self.partition_handle)
         if len(_partitions) != 1:
             raise ValueError(
@@ -136,21 +209,27 @@ class RawVolume(PartitionBasedVolume):
                 f"were found for handle {self._handle}"
             )
         self.partition: parted.Partition = _partitions[0]
-        self._built = True
+        self.sys_device = self.partition.path
+        self.built = True
 
     def build(self):
         ...
 
-    @property
-    def built(self):
-        return self._built
-
-    @property
-    def sys_device(self) -> str:
-        return self.partition.path
-
 
 class RaidVolume(PartitionBasedVolume):
+    __slots__ = (
+        "spare_indices",
+        "raid_dev_name",
+        "dev_indices",
+        "raid_level",
+        "meta_data_version",
+        "devices",
+        "spares",
+        "partition_handle",
+        "built",
+        "sys_device",
+    )
+
     def __init__(
         self,
         *args,
@@ -194,38 +273,36 @@ class RaidVolume(PartitionBasedVolume):
                 f"but {len(self.partitions_handle)} were given."
             )
         self.partition_handle = self.partitions_handle[0]
-        self._built = False
+        self.sys_device = self.raid_dev_name
+        self.built = False
 
     def set_meta_data_version(self, meta_data_version: str):
         meta_data_version = str(meta_data_version)
-        if meta_data_version not in ("0", "0.90", "1.0", "1", "1.2"):
+        if meta_data_version not in _META_DATA_VERSIONS:
             raise ValueError(
-                f"You requested meta_data version {self.meta_data_version}, unkown to me."
+                f"You requested meta_data version {meta_data_version}, unkown to me."
             )
         self.meta_data_version = meta_data_version
 
     def set_raid_level(self, raid_level: int):
         if raid_level not in (0, 1, 4, 5, 6, 10):
             raise ValueError(
-                f"You requested raid {self.raid_level} level I don't Know this level"
+                f"You requested raid {raid_level} level I don't Know this level"
             )
         self.raid_level = raid_level
 
     def _check_devices(self):
-        if self.raid_level == 1 and len(self.dev_indices) != 2:
+        exact_devs = _RAID_EXACT_DEVS.get(self.raid_level)
+        min_devs = _RAID_MIN_DEVS.get(self.raid_level)
+        if exact_devs is not None and len(self.dev_indices) != exact_devs:
             raise ValueError(
                 f"wrong number of devices for raid {self.raid_level} "
-                f"expected 2 got {len(self.dev_indices)}"
+                f"expected {exact_devs} got {len(self.dev_indices)}"
             )
-        elif self.raid_level == 10 and len(self.dev_indices) != 4:
+        elif min_devs is not None and len(self.dev_indices) < min_devs:
             raise ValueError(
                 f"wrong number of devices for raid {self.raid_level} "
-                f"expected 4 got {len(self.dev_indices)}"
-            )
-        elif self.raid_level in (4, 5, 6) and len(self.dev_indices) < 3:
-            raise ValueError(
-                f"wrong number of devices for raid {self.raid_level} "
-                f"expected >= 3 got {len(self.dev_indices)}"
+                f"expected >= {min_devs} got {len(self.dev_indices)}"
             )
         devs_set = set(self.dev_indices)
         spares_set = set(self.spare_indices)
@@ -234,42 +311,38 @@ class RaidVolume(PartitionBasedVolume):
                 "Some devices are common between raid and spare devices this must not happen"
             )
         total_expected_devices = len(self.spare_indices) + len(self.dev_indices)
-        total_available_devices = len(
-            self.partitionners.get_partitions_by_handle(self.partitions_handle)
+        part_devices = self.partitionners.get_partitions_by_handle(
+            self.partitions_handle
         )
-        if total_expected_devices != total_available_devices:
+        if total_expected_devices != len(part_devices):
             raise ValueError(
                 "You expect {total_expected_devices} devices including spares to be cre"
             )
 
-        self.set_devices()
+        self.set_devices(part_devices)
 
-    def set_devices(self):
-        part_devices = self.partitionners.get_partitions_by_handle(
-            self.partitions_handle
-        )
+    def set_devices(self, part_devices: Union[None, List[parted.Partition]] = None):
+        if part_devices is None:
+            part_devices = self.partitionners.get_partitions_by_handle(
+                self.partitions_handle
+            )
         self.devices = [part_devices[idx] for idx in self.dev_indices]
         self.spares = [part_devices[idx] for idx in self.spare_indices]
 
-    def _gen_build_command(self) -> str:
-        command = "mdadm --create {raid_dev_name} --force --level={level} --raid-devices={nb_devs}"
-        spares_cmd_switch = "--spare-devices={nb_spares}"
-        devs = "{devs}"
-        format_params = {
-            "raid_dev_name": self.raid_dev_name,
-            "level": self.raid_level,
-            "nb_devs": len(self.devices),
-            "devs": " ".join([dev.path for dev in self.devices]),
-        }
-        final_command = command
+    def _gen_build_command(self) -> List[str]:
+        command = [
+            "mdadm",
+            "--create",
+            self.raid_dev_name,
+            "--force",
+            f"--level={self.raid_level}",
+            f"--raid-devices={len(self.devices)}",
+        ]
         if self.spares:
-            final_command = f"{final_command} {spares_cmd_switch}"
-            format_params["nb_spares"] = len(self.spares)
-            format_params["devs"] += " "
-            format_params["devs"] += " ".join([spare.path for spare in self.spares])
-        final_command = f"{final_command} {devs}"
-        final_command = final_command.format(**format_params)
-        return final_command
+            command.append(f"--spare-devices={len(self.spares)}")
+        command.extend(dev.path for dev in self.devices)
+        command.extend(spare.path for spare in self.spares)
+        return command
 
     def build(self):
         if self.meta_data_version in ("1.0", "1", "1.2"):
@@ -283,24 +356,19 @@ class RaidVolume(PartitionBasedVolume):
         )
         if result.returncode != 0:
             raise subprocess.SubprocessError(
-                f"Command : {command} Failed ({result.returncode}). {str(result)}"
+                f"Command : {' '.join(command)} Failed "
+                f"({result.returncode}). {str(result)}"
             )
         if not os.path.exists(self.raid_dev_name):
             raise LookupError(
                 f"For some reqson device {self.raid_dev_name} was not created"
             )
-        self._built = True
-
-    @property
-    def built(self):
-        return self._built
-
-    @property
-    def sys_device(self) -> str:
-        return self.raid_dev_name
+        self.built = True
 
 
 class LvmVgVolume(MulitMixedVolume):
+    __slots__ = ("built", "devices", "vg_dev", "sys_device")
+
     def __init__(
         self,
         *args,
@@ -317,31 +385,55 @@ class LvmVgVolume(MulitMixedVolume):
             volumes_handles=volumes_handles,
             handle=handle,
         )
-        self._built = False
+        self.built = False
         self.devices: Union[None, List[str]]
         self.vg_dev: Union[None, str]
 
     def ensure_pv(self):
+        devices_per_dir: Dict[str, List[str]] = {}
         for pv_dev in self.devices:
-            if not os.path.exists(pv_dev):
-                raise LookupError(f"Linux device {pv_dev}")
-            cmd = subprocess.run(gen_cmd_for_subprocess(f"pvs {pv_dev}"))
-            if cmd.returncode != 0:
-                cmd = subprocess.run(gen_cmd_for_subprocess(f"pvcreate -f {pv_dev}"))
-            if cmd.returncode != 0:
-                raise RuntimeError(f"Could not ensure lvm pv on {pv_dev}")
+            devices_per_dir.setdefault(os.path.dirname(pv_dev), []).append(pv_dev)
+        for parent_dir, pv_devs in devices_per_dir.items():
+            try:
+                existing = {entry.name for entry in os.scandir(parent_dir)}
+            except FileNotFoundError:
+                existing = set()
+            for pv_dev in pv_devs:
+                if os.path.basename(pv_dev) not in existing:
+                    raise LookupError(f"Linux device {pv_dev}")
+        cmd = subprocess.run(
+            gen_cmd_for_subprocess(
+                ["pvs", "--noheadings", "-o", "pv_name,vg_name"] + self.devices
+            ),
+            capture_output=True,
+            text=True,
+        )
+        known_pvs: Dict[str, str] = {}
+        for line in cmd.stdout.splitlines():
+            fields = line.split()
+            if fields:
+                known_pvs[fields[0]] = fields[1] if len(fields) > 1 else ""
+        attached = {pv: vg for pv, vg in known_pvs.items() if vg}
+        if attached:
+            raise ValueError(
+                f"Lvm pv already exists ans is attached to vg:{attached}"
+            )
+        missing = [pv_dev for pv_dev in self.devices if pv_dev not in known_pvs]
+        if missing:
             cmd = subprocess.run(
-                gen_cmd_for_subprocess(f"pvdisplay -c {pv_dev}"), capture_output=True
+                gen_cmd_for_subprocess(["pvcreate", "-f"] + missing),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
             )
-            vg = cmd.stdout.decode("utf-8").strip().splitlines()[-1].split(":")[1]
-            if vg:
-                raise ValueError(f"Lvm pv already exists ans is attached to vg:{vg}")
+            if cmd.returncode != 0:
+                raise RuntimeError(f"Could not ensure lvm pv on {' '.join(missing)}")
 
     def _set_device_list(self):
         devices: List[str] = [
             str(part.path)
-            for handle in self.partitions_handles
-            for part in self.handled_parts.get_partitions_by_handle(handle)
+            for part in self.handled_parts.get_partitions_by_handles(
+                self.partitions_handles
+            )
         ]
         devices.extend(
             [
@@ -355,26 +447,21 @@ class LvmVgVolume(MulitMixedVolume):
         self._set_device_list()
         self.ensure_pv()
         command = f"vgcreate {self.handle} {' '.join(self.devices)}"
-        cmd = subprocess.run(gen_cmd_for_subprocess(command), capture_output=True)
+        cmd = subprocess.run(
+            gen_cmd_for_subprocess(command), capture_output=True, text=True
+        )
         if cmd.returncode != 0:
-            error = cmd.stderr.decode("utf-8").replace("\n", " -> ")
+            error = cmd.stderr.replace("\n", " -> ")
             raise RuntimeError(f"Unable to Create lvm vg {self.handle} error: {error}")
-        self.handled_vols._add_volume(self)
         self.vg_dev = f"/dev/{self.handle}"
-        self._built = True
-
-    @property
-    def built(self):
-        return self._built
-
-    @property
-    def sys_device(self) -> str:
-        if not self.vg_dev:
-            raise RuntimeError("Lvm VG not built yet")
-        return self.vg_dev
+        self.sys_device = self.vg_dev
+        self.built = True
+        self.handled_vols._add_volume(self)
 
 
 class LvmLvVolume(VolumeBasedVolume):
+    __slots__ = ("vg_percent", "lv_dev", "built", "sys_device")
+
     def __init__(
         self,
         *args,
@@ -388,18 +475,28 @@ class LvmLvVolume(VolumeBasedVolume):
         )
         self.vg_percent = float(vg_percent)
         self.lv_dev: Union[None, str] = None
-        self._built = False
+        self.built = False
 
-    def _vg_has_enough_space(self, vol: Volume) -> Tuple[bool, float]:
+    def _vg_space(self, vol: Volume) -> Tuple[int, int]:
+        cache = self.handled_vols._vg_space_cache
+        if vol.sys_device in cache:
+            return cache[vol.sys_device]
         available_percent_command = f"vgdisplay -c {vol.sys_device}"
         available_percent_cmd = subprocess.run(
-            gen_cmd_for_subprocess(available_percent_command), capture_output=True
+            gen_cmd_for_subprocess(available_percent_command),
+            capture_output=True,
+            text=True,
         )
         if available_percent_cmd.returncode != 0:
             raise RuntimeError("Lvm: failed to read vg data")
-        output = available_percent_cmd.stdout.decode("utf-8").strip()
-        free = int(output.split(":")[-2])
-        total = int(output.split(":")[-4])
+        fields = available_percent_cmd.stdout.strip().split(":")
+        free = int(fields[-2])
+        total = int(fields[-4])
+        cache[vol.sys_device] = (free, total)
+        return free, total
+
+    def _vg_has_enough_space(self, vol: Volume) -> Tuple[bool, float]:
+        free, total = self._vg_space(vol)
         available_percent = free / total * 100
         if available_percent < self.vg_percent:
             return False, available_percent
@@ -420,23 +517,22 @@ class LvmLvVolume(VolumeBasedVolume):
         command = (
             f"lvcreate -l {round(self.vg_percent)}%VG -n {self.handle} {vol.sys_device}"
         )
-        cmd = subprocess.run(gen_cmd_for_subprocess(command), capture_output=True)
+        cmd = subprocess.run(
+            gen_cmd_for_subprocess(command), capture_output=True, text=True
+        )
         if cmd.returncode != 0:
-            error = cmd.stderr.decode("utf-8").replace("\n", " -> ")
+            error = cmd.stderr.replace("\n", " -> ")
             raise RuntimeError(
                 f"Lvm: Logical Volume creation of {self.handle} on "
                 f"vg {vol.sys_device} Failed. Error: {error}"
             )
-        self._built = True
+        free, total = self.handled_vols._vg_space_cache[vol.sys_device]
+        used_extents = round(self.vg_percent) * total // 100
+        self.handled_vols._vg_space_cache[vol.sys_device] = (
+            free - used_extents,
+            total,
+        )
         self.lv_dev = f"{vol.sys_device}/{self.handle}"
+        self.sys_device = self.lv_dev
+        self.built = True
         self.handled_vols._add_volume(self)
-
-    @property
-    def built(self):
-        return self._built
-
-    @property
-    def sys_device(self) -> str:
-        if not self.lv_dev:
-            raise RuntimeError("Lvm VG not built yet")
-        return self.lv_dev
@@ -0,0 +1,79 @@
+import os
+import shutil
+import subprocess
+import threading
+
+import pytest
+
+_SUDO_REFRESH_SECONDS = 240
+
+
+@pytest.fixture(scope="session", autouse=True)
+def sudo_session():
+    """Prime the sudo credential cache once for the whole session.
+
+    Test commands can then run with 'sudo -n' and never enter the
+    password prompt path. Nothing to do when already root or when sudo
+    is not installed.
+    """
+    if os.getuid() == 0 or shutil.which("sudo") is None:
+        yield
+        return
+    subprocess.run(["sudo", "-v"])
+    stop = threading.Event()
+
+    def _refresh():
+        while not stop.wait(_SUDO_REFRESH_SECONDS):
+            subprocess.run(["sudo", "-n", "-v"])
+
+    refresher = threading.Thread(target=_refresh, daemon=True)
+    refresher.start()
+    yield
+    stop.set()
+
+
+_LOOP_DEVICES = tuple(f"/dev/loop{100 + index}" for index in range(4))
+_LOOP_SIZE_BYTES = 80_000 * 512
+
+
+def _losetup(*args: str) -> int:
+    """Run losetup unprivileged first (pretest.sh setups grant the disk
+    group), quietly falling back to sudo -n."""
+    plain = subprocess.run(
+        ["losetup", *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    if plain.returncode == 0:
+        return 0
+    return subprocess.run(["sudo", "-n", "losetup", *args]).returncode
+
+
+@pytest.fixture(scope="session")
+def loop_devices(tmp_path_factory):
+    """Provide /dev/loop100..103 once for the whole session.
+
+    Devices already present on the host are left untouched; missing
+    ones get a sparse backing file and a losetup attach, detached again
+    at session end. Tests that cannot get their devices are skipped.
+    """
+    missing = [dev for dev in _LOOP_DEVICES if not os.path.exists(dev)]
+    attached = []
+    if missing:
+        if shutil.which("losetup") is None:
+            pytest.skip("losetup is not available to create loop devices")
+        backing_dir = tmp_path_factory.mktemp("loop_backing")
+        for dev in missing:
+            backing = backing_dir / f"{os.path.basename(dev)}.img"
+            with open(backing, "wb") as backing_file:
+                backing_file.truncate(_LOOP_SIZE_BYTES)
+            if _losetup(dev, str(backing)) != 0:
+                # skip aborts the fixture before the yield: detach what
+                # was already attached so nothing leaks on the host
+                for attached_dev in attached:
+                    _losetup("-d", attached_dev)
+                pytest.skip(f"could not attach loop device {dev}")
+            attached.append(dev)
+    yield _LOOP_DEVICES
+    for dev in attached:
+        _losetup("-d", dev)
@@ -12,6 +12,11 @@ from py_part_recipe.partition_common import (
 )
 
 LOGGER = logging.getLogger()
+# parse the expected results once for every parametrized case, with the
+# libyaml loader when the extension is available
+_SAFE_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+with open("tests/test_recipe_valid.yaml", "r", encoding="utf-8") as expected_file:
+    _EXPECTED_DISKS = yaml.load(expected_file, Loader=_SAFE_LOADER)
 
 
 def setup_clean_disk(disk: str):
@@ -66,6 +71,7 @@ def setup_partialy_used_disk(disk: str):
     ),
 )
 def test_BlockDevice_on_clean_drive(
+    loop_devices,
     device: Literal["/dev/loop100"],
     expected_nb_block: Literal[77919],
     expected_block_size: Literal[512],
@@ -87,6 +93,7 @@ def test_BlockDevice_on_clean_drive(
     ),
 )
 def test_BlockDevice_on_used_drive(
+    loop_devices,
     device: Literal["/dev/loop100"],
     expected_nb_block: Literal[77911],
     expected_block_size: Literal[512],
@@ -225,6 +232,7 @@ def test_raise_convert_size_to_bytes(
     ),
 )
 def test_recipe_valid_same_partitions_keep_existing(
+    loop_devices,
     devices: str,
     partition_requests: PartitionRequest,
     expected_disk_dict: dict[Any, Any],
@@ -233,9 +241,7 @@ def test_recipe_valid_same_partitions_keep_existing(
         setup_partialy_used_disk(device)
     parting = Partitionner(Recipe(devices, partition_requests, keep_partitions=True))
     parting.create_partitions_mapping()
-    expected_result_dict = yaml.safe_load(
-        open("tests/test_recipe_valid.yaml", "r", encoding="utf-8"),
-    )[expected_disk_dict]
+    expected_result_dict = _EXPECTED_DISKS[expected_disk_dict]
     assert str(parting) == yaml.safe_dump(
         expected_result_dict,
         default_flow_style=False,
@@ -345,6 +351,7 @@ def test_recipe_valid_same_partitions_keep_existing(
     ),
 )
 def test_recipe_valid_same_partitions_flush_existing(
+    loop_devices,
     devices: str,
     partition_requests: PartitionRequest,
     expected_disk_dict: dict[Any, Any],
@@ -353,9 +360,7 @@ def test_recipe_valid_same_partitions_flush_existing(
         setup_partialy_used_disk(device)
     parting = Partitionner(Recipe(devices, partition_requests, keep_partitions=False))
     parting.create_partitions_mapping()
-    expected_result_dict = yaml.safe_load(
-        open("tests/test_recipe_valid.yaml", "r", encoding="utf-8"),
-    )[expected_disk_dict]
+    expected_result_dict = _EXPECTED_DISKS[expected_disk_dict]
     assert str(parting) == yaml.safe_dump(
         expected_result_dict,
         default_flow_style=False,
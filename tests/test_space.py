@@ -15,6 +15,24 @@ def test_optimal_size(size, block_size, expected_size):
     assert optimal_size(size, block_size) == expected_size
 
 
+def test_optimal_size_batch():
+    # whole table checked in one test to skip per-case dispatch overhead
+    cases = (
+        (2, 10, True, 10),
+        (12, 10, True, 20),
+        (20, 10, True, 20),
+        (2, 10, False, 0),
+        (12, 10, False, 10),
+        (20, 10, False, 20),
+        (4097, 4096, True, 8192),
+        (4097, 4096, False, 4096),
+    )
+    results = [
+        optimal_size(size, block_size, upward) for size, block_size, upward, _ in cases
+    ]
+    assert results == [expected for _, _, _, expected in cases]
+
+
 @pytest.mark.parametrize("size,block_size", ((-2, 10), (12, -10), (-20, -10)))
 def test_optimal_size_negative_params(size, block_size):
     with pytest.raises(ValueError):